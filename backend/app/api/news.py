@@ -1,9 +1,13 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any, Optional
 from app.services.news_aggregator import get_crypto_news
+from app.services.resilience import deadline
 
 router = APIRouter()
 
+# Overall budget for a news request (seconds)
+NEWS_DEADLINE_SECONDS = 10
+
 
 @router.get("/articles", response_model=Dict[str, Any])
 async def get_news_articles(coins: Optional[str] = None, limit: Optional[int] = 5):
@@ -23,7 +27,8 @@ async def get_news_articles(coins: Optional[str] = None, limit: Optional[int] =
             coin_list = [coin.strip() for coin in coins.split(",")]
         
         # Fetch news for the specified coins
-        news_data = await get_crypto_news(coin_list, limit=limit)
+        with deadline(NEWS_DEADLINE_SECONDS):
+            news_data = await get_crypto_news(coin_list, limit=limit)
         return {"data": news_data, "status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
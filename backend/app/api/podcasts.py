@@ -2,8 +2,11 @@ from fastapi import APIRouter, HTTPException, Response
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+import math
 import os
 from app.services.podcast_generator import generate_podcast
+from app.services.resilience import deadline, CircuitOpenError, DeadlineExceeded
+from app.services.admission import admission_control
 
 class PodcastRequest(BaseModel):
     coin_ids: List[str]
@@ -13,20 +16,31 @@ class PodcastRequest(BaseModel):
 
 router = APIRouter()
 
-@router.post("/generate", response_model=Dict[str, Any])
+# Overall budget for generating a single podcast (seconds)
+PODCAST_DEADLINE_SECONDS = 240
+
+# Suggested wait before retrying a podcast that ran out of time (seconds)
+DEADLINE_RETRY_AFTER_SECONDS = 60
+
+@router.post("/generate", response_model=Dict[str, Any], dependencies=[admission_control("podcast")])
 async def generate_podcast_endpoint(request: PodcastRequest):
     """Generate a podcast about selected cryptocurrencies"""
     try:
-        podcast_data = await generate_podcast(
-            coin_ids=request.coin_ids, 
-            duration_minutes=request.duration_minutes,
-            voice_type=request.voice_type,
-            include_price_analysis=request.include_price_analysis
-        )
+        with deadline(PODCAST_DEADLINE_SECONDS):
+            podcast_data = await generate_podcast(
+                coin_ids=request.coin_ids, 
+                duration_minutes=request.duration_minutes,
+                voice_type=request.voice_type,
+                include_price_analysis=request.include_price_analysis
+            )
         
         # Remove internal path before returning to client
         response_data = {k: v for k, v in podcast_data.items() if k != 'audio_path'}
         return {"data": response_data, "status": "success"}
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        # An upstream is down or too slow; tell the client to come back later
+        retry_after = e.retry_after if isinstance(e, CircuitOpenError) else DEADLINE_RETRY_AFTER_SECONDS
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(retry_after))})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,35 +1,32 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Request
 import requests
 import os
+import asyncio
+import threading
 import time
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional
-from openai import OpenAI
 import logging
 import json
 from datetime import datetime, timedelta
+from app.config import get_settings
+from app.services.clients import registry
+from app.services.risk_scoring import score_coin, score_coins
+from app.services.admission import admit
+from app.services.resilience import (
+    deadline, remaining_time, request_timeout, resilient_get, circuit, CircuitOpenError, DeadlineExceeded
+)
 
 router = APIRouter()
 
-# API Keys
-XAI_API_KEY = os.getenv("XAI_API_KEY", "")
-COINGECKO_API_KEY = os.getenv("COINGECKO_API_KEY", "")
-COINGECKO_API_KEY_2 = os.getenv("COINGECKO_API_KEY_2", "")
-
 # CoinGecko API Endpoint
 COINGECKO_URL = "https://api.coingecko.com/api/v3/coins"
+COINGECKO_MARKETS_URL = f"{COINGECKO_URL}/markets"
 
 # API Key management
-api_keys = [k for k in [COINGECKO_API_KEY, COINGECKO_API_KEY_2] if k]
 current_key_index = 0
 last_key_use_time = 0
 
-# OpenAI Client for X.ai
-client = OpenAI(
-    api_key=XAI_API_KEY,
-    base_url="https://api.x.ai/v1",
-)
-
 # Simple in-memory cache for coin data and analysis results
 # Structure: {coin_id: {"data": {...}, "timestamp": datetime, "analysis": {...}}}
 COIN_CACHE = {}
@@ -37,14 +34,31 @@ COIN_CACHE = {}
 # Cache duration (in hours)
 CACHE_DURATION = 24  # Cache results for 24 hours
 
+# Failures that only mean "not right now" (open circuit, exhausted deadline).
+# Mock results caused by these are returned but never cached.
+TRANSIENT_ERRORS = (CircuitOpenError, DeadlineExceeded)
+
 # Rate limiting
-LAST_REQUEST_TIME = 0
+LAST_REQUEST_TIME = 0  # Time the most recently reserved request is (or was) sent
 MIN_REQUEST_INTERVAL = 6  # Seconds between requests (max 10 per minute)
+REQUEST_SLOT_LOCK = threading.Lock()
+
+# Overall budget for a single rug pull analysis (seconds)
+RUGPULL_DEADLINE_SECONDS = 20
+
+# Upstream call timeouts (seconds)
+# CoinGecko requests are never hedged: a second request would bypass MIN_REQUEST_INTERVAL
+COINGECKO_TIMEOUT = 8
+XAI_TIMEOUT = 10  # Keep above the xai breaker's slow_call_seconds
+
+# How often the background job refreshes heuristic scores for the top coins
+HEURISTIC_REFRESH_INTERVAL = 60 * 60  # Seconds
 
 def get_api_key():
     """Get the next available API key using round-robin if multiple keys are available."""
     global current_key_index, last_key_use_time
     
+    api_keys = get_settings().coingecko_api_keys
     if not api_keys:
         return None
     
@@ -61,58 +75,69 @@ def get_api_key():
     return api_keys[current_key_index]
 
 def throttled_request(url: str) -> requests.Response:
-    """Make a throttled request to respect rate limits."""
+    """Make a throttled request to respect rate limits.
+    
+    Safe to call from several threads: each caller reserves its own send slot,
+    MIN_REQUEST_INTERVAL after the previous one, under a lock before sleeping.
+    """
     global LAST_REQUEST_TIME
     
-    # Calculate time since last request
-    current_time = time.time()
-    time_since_last_request = current_time - LAST_REQUEST_TIME
+    with REQUEST_SLOT_LOCK:
+        current_time = time.time()
+        send_at = max(current_time, LAST_REQUEST_TIME + MIN_REQUEST_INTERVAL)
+        sleep_time = send_at - current_time
+        
+        # Don't wait out the rate limit if the request would miss its deadline anyway
+        remaining = remaining_time()
+        if sleep_time > 0 and remaining is not None and sleep_time >= remaining:
+            raise DeadlineExceeded("Not enough time left to wait for the CoinGecko rate limit")
+        
+        LAST_REQUEST_TIME = send_at
+        # Get API key
+        api_key = get_api_key()
     
     # If we need to wait to respect rate limits
-    if time_since_last_request < MIN_REQUEST_INTERVAL:
-        sleep_time = MIN_REQUEST_INTERVAL - time_since_last_request
+    if sleep_time > 0:
         logging.info(f"Rate limiting: Sleeping for {sleep_time:.2f} seconds")
         time.sleep(sleep_time)
     
-    # Get API key
-    api_key = get_api_key()
     headers = {"x-cg-api-key": api_key} if api_key else {}
     
     # Make the request
     logging.info(f"Making request to {url}" + (" with API key" if api_key else " without API key"))
-    response = requests.get(url, headers=headers)
-    LAST_REQUEST_TIME = time.time()
-    
-    return response
+    return resilient_get("coingecko", url, headers=headers, timeout=COINGECKO_TIMEOUT)
 
-def get_cached_coin_data(coin_id: str):
-    """Get coin data from cache if available and not expired."""
+def get_cached_coin_data(coin_id: str, allow_stale: bool = False):
+    """Get coin data from cache if available and not expired (or at all, with `allow_stale`)."""
     if coin_id in COIN_CACHE:
         cache_entry = COIN_CACHE[coin_id]
         cache_time = cache_entry.get("timestamp")
         
         # Check if cache is still valid
-        if cache_time and datetime.now() - cache_time < timedelta(hours=CACHE_DURATION):
+        if allow_stale or (cache_time and datetime.now() - cache_time < timedelta(hours=CACHE_DURATION)):
             logging.info(f"Using cached data for {coin_id}")
             return cache_entry.get("data")
     
     return None
 
-def get_cached_analysis(coin_id: str):
-    """Get analysis from cache if available and not expired."""
+def get_cached_analysis(coin_id: str, allow_stale: bool = False):
+    """Get analysis from cache if available and not expired (or at all, with `allow_stale`)."""
     if coin_id in COIN_CACHE and "analysis" in COIN_CACHE[coin_id]:
         cache_entry = COIN_CACHE[coin_id]
         cache_time = cache_entry.get("timestamp")
         
         # Check if cache is still valid
-        if cache_time and datetime.now() - cache_time < timedelta(hours=CACHE_DURATION):
+        if allow_stale or (cache_time and datetime.now() - cache_time < timedelta(hours=CACHE_DURATION)):
             logging.info(f"Using cached analysis for {coin_id}")
             return cache_entry.get("analysis")
     
     return None
 
-def update_cache(coin_id: str, data=None, analysis=None):
-    """Update the cache with new data or analysis."""
+def update_cache(coin_id: str, data=None, analysis=None, source="llm"):
+    """Update the cache with new data or analysis.
+    
+    `source` records where an analysis came from: "llm", "heuristic" (local scoring model) or "mock".
+    """
     if coin_id not in COIN_CACHE:
         COIN_CACHE[coin_id] = {"timestamp": datetime.now()}
     
@@ -121,6 +146,7 @@ def update_cache(coin_id: str, data=None, analysis=None):
     
     if analysis:
         COIN_CACHE[coin_id]["analysis"] = analysis
+        COIN_CACHE[coin_id]["source"] = source
         
     COIN_CACHE[coin_id]["timestamp"] = datetime.now()
 
@@ -181,18 +207,52 @@ def get_mock_rug_pull_analysis(coin_id: str, coin_name: str, coin_symbol: str) -
         coin_info=mock_coin_info
     )
 
+def get_local_analysis(coin_id: str, provided_coin_data: Dict[str, Any] = None) -> Optional[RugPullRisk]:
+    """
+    Answer without any upstream call if possible: a cached analysis, or a
+    clear-cut heuristic score from provided or cached coin data.
+    """
+    cached_analysis = get_cached_analysis(coin_id)
+    if cached_analysis:
+        return RugPullRisk(**cached_analysis)
+    
+    coin_data = provided_coin_data or get_cached_coin_data(coin_id)
+    if not coin_data:
+        return None
+    
+    try:
+        coin_info = extract_coin_info(coin_data)
+        heuristic = score_coin(coin_info)
+    except Exception as e:
+        # Malformed coin data; let the full analysis deal with it
+        logging.warning(f"Could not pre-score {coin_id}: {e}")
+        return None
+    if not heuristic:
+        return None
+    
+    result = RugPullRisk(coin_info=coin_info, **heuristic)
+    update_cache(coin_id, data=provided_coin_data, analysis=result.dict(), source="heuristic")
+    return result
+
 @router.get("/{coin_id}", response_model=RugPullRisk)
-async def analyze_rug_pull_risk_get(coin_id: str):
+async def analyze_rug_pull_risk_get(coin_id: str, request: Request):
     """
     Analyze the rug pull risk for a specific cryptocurrency using GET method.
     
     Uses CoinGecko data and X.ai's Grok model to evaluate the risk.
     Returns a risk score and justification.
     """
-    return await analyze_rug_pull_risk(coin_id)
+    # Cached and clear-cut results are cheap, so only the upstream path is admission-controlled
+    local_result = get_local_analysis(coin_id)
+    if local_result:
+        return local_result
+    
+    async with admit(request, "rugpull"):
+        with deadline(RUGPULL_DEADLINE_SECONDS):
+            return await analyze_rug_pull_risk(coin_id)
 
 @router.post("/{coin_id}", response_model=RugPullRisk)
-async def analyze_rug_pull_risk_post(coin_id: str, coin_input: CoinDataInput = Body(...)):
+async def analyze_rug_pull_risk_post(coin_id: str, request: Request, coin_input: CoinDataInput = Body(...)):
     """
     Analyze the rug pull risk for a specific cryptocurrency using POST method with existing coin data.
     
@@ -200,7 +260,13 @@ async def analyze_rug_pull_risk_post(coin_id: str, coin_input: CoinDataInput = B
     Uses X.ai's Grok model to evaluate the risk.
     Returns a risk score and justification.
     """
-    return await analyze_rug_pull_risk(coin_id, coin_input.coin_data)
+    local_result = get_local_analysis(coin_id, coin_input.coin_data)
+    if local_result:
+        return local_result
+    
+    async with admit(request, "rugpull"):
+        with deadline(RUGPULL_DEADLINE_SECONDS):
+            return await analyze_rug_pull_risk(coin_id, coin_input.coin_data)
 
 async def analyze_rug_pull_risk(coin_id: str, provided_coin_data: Dict[str, Any] = None):
     """
@@ -226,54 +292,79 @@ async def analyze_rug_pull_risk(coin_id: str, provided_coin_data: Dict[str, Any]
             if not coin_data:
                 # If not in cache, fetch from CoinGecko with rate limiting
                 logging.info(f"Fetching coin data for {coin_id} from CoinGecko")
-                response = throttled_request(f"{COINGECKO_URL}/{coin_id}")
+                transient_failure = False
+                try:
+                    response = await asyncio.to_thread(throttled_request, f"{COINGECKO_URL}/{coin_id}")
+                except (requests.RequestException, *TRANSIENT_ERRORS) as e:
+                    logging.warning(f"CoinGecko unavailable: {e}")
+                    transient_failure = isinstance(e, TRANSIENT_ERRORS)
+                    response = None
                 
-                if response.status_code != 200:
-                    logging.warning(f"CoinGecko API error: {response.status_code}, {response.text}")
+                if response is not None and response.status_code == 200:
+                    coin_data = response.json()
+                    # Cache the result
+                    update_cache(coin_id, data=coin_data)
+                else:
+                    if response is not None:
+                        logging.warning(f"CoinGecko API error: {response.status_code}, {response.text}")
+                    # Expired data is still better than mock data
+                    coin_data = get_cached_coin_data(coin_id, allow_stale=True)
+                    
+                if not coin_data:
                     # If we can't get data, use mock data
                     mock_result = get_mock_rug_pull_analysis(
                         coin_id=coin_id, 
                         coin_name=coin_id.replace("-", " ").title(),
                         coin_symbol=coin_id.split("-")[0].upper()
                     )
-                    # Cache the mock result to avoid hammering the API
-                    update_cache(coin_id, analysis=mock_result.dict())
+                    # Cache the mock result to avoid hammering the API, unless CoinGecko is merely unavailable right now
+                    if not transient_failure:
+                        update_cache(coin_id, analysis=mock_result.dict(), source="mock")
                     return mock_result
-                    
-                coin_data = response.json()
-                # Cache the result
-                update_cache(coin_id, data=coin_data)
         
         # Extract the relevant coin information for analysis
         coin_info = extract_coin_info(coin_data)
         coin_name = coin_info["Name"]
         coin_symbol = coin_info["Symbol"]
         
+        # Clear-cut coins are scored locally; only ambiguous ones go to the LLM
+        heuristic = score_coin(coin_info)
+        if heuristic:
+            result = RugPullRisk(coin_info=coin_info, **heuristic)
+            update_cache(coin_id, analysis=result.dict(), source="heuristic")
+            return result
+        
         # If X.ai API key is not set, return mock data
-        if not XAI_API_KEY:
+        if not get_settings().xai_api_key:
             logging.warning("XAI_API_KEY not set, using mock data")
             mock_result = get_mock_rug_pull_analysis(coin_id, coin_name, coin_symbol)
             mock_result.coin_info = coin_info  # Use real coin data if available
             # Cache the result
-            update_cache(coin_id, analysis=mock_result.dict())
+            update_cache(coin_id, analysis=mock_result.dict(), source="mock")
             return mock_result
             
         # Determine Rug Pull Risk Score using Grok
         try:
-            score_response = client.chat.completions.create(
-                model="grok-2-latest",
-                temperature=0,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Rug pull: When founders abandon a project and take investors' money. Return a score out of 100 indicating the rug pull risk of the coin and symbol provided. 100 = high risk. Search the internet to find data about it. Use the following data for your assessment: " + str(coin_info) + " Return nothing else."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"{coin_name}, {coin_symbol}"
-                    },
-                ],
-            )
+            client = registry.xai()
+            timeout = request_timeout(XAI_TIMEOUT)
+            with circuit("xai"):
+                # Blocking SDK calls run in a worker thread so the event loop stays responsive
+                score_response = await asyncio.to_thread(
+                    client.chat.completions.create,
+                    model="grok-2-latest",
+                    temperature=0,
+                    timeout=timeout,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "Rug pull: When founders abandon a project and take investors' money. Return a score out of 100 indicating the rug pull risk of the coin and symbol provided. 100 = high risk. Search the internet to find data about it. Use the following data for your assessment: " + str(coin_info) + " Return nothing else."
+                        },
+                        {
+                            "role": "user",
+                            "content": f"{coin_name}, {coin_symbol}"
+                        },
+                    ],
+                )
             
             score_content = score_response.choices[0].message.content.strip()
             try:
@@ -284,20 +375,24 @@ async def analyze_rug_pull_risk(coin_id: str, provided_coin_data: Dict[str, Any]
                 score = 50
             
             # Get Justification for the Score
-            justification_response = client.chat.completions.create(
-                model="grok-2-latest",
-                temperature=0,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Rug pull: When founders abandon a project and take investors' money. Score given indicates risk score of rugpull. 0 = low risk, 100 = high risk. Return a short justification for the score. Use the following data for your assessment: " + str(coin_info) + " Do not include the score in the output. Max 100 words."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"{coin_name}, {coin_symbol}, {score}"
-                    },
-                ],
-            )
+            timeout = request_timeout(XAI_TIMEOUT)
+            with circuit("xai"):
+                justification_response = await asyncio.to_thread(
+                    client.chat.completions.create,
+                    model="grok-2-latest",
+                    temperature=0,
+                    timeout=timeout,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "Rug pull: When founders abandon a project and take investors' money. Score given indicates risk score of rugpull. 0 = low risk, 100 = high risk. Return a short justification for the score. Use the following data for your assessment: " + str(coin_info) + " Do not include the score in the output. Max 100 words."
+                        },
+                        {
+                            "role": "user",
+                            "content": f"{coin_name}, {coin_symbol}, {score}"
+                        },
+                    ],
+                )
             
             justification = justification_response.choices[0].message.content.strip()
             
@@ -314,11 +409,16 @@ async def analyze_rug_pull_risk(coin_id: str, provided_coin_data: Dict[str, Any]
             
         except Exception as e:
             logging.error(f"Error with Grok API: {e}")
+            # Prefer an expired analysis over mock data
+            stale_analysis = get_cached_analysis(coin_id, allow_stale=True)
+            if stale_analysis:
+                return RugPullRisk(**stale_analysis)
             # Fall back to mock data but use real coin info
             mock_result = get_mock_rug_pull_analysis(coin_id, coin_name, coin_symbol)
             mock_result.coin_info = coin_info
-            # Cache the result
-            update_cache(coin_id, analysis=mock_result.dict())
+            # Cache the result, unless Grok is merely unavailable right now
+            if not isinstance(e, TRANSIENT_ERRORS):
+                update_cache(coin_id, analysis=mock_result.dict(), source="mock")
             return mock_result
             
     except Exception as e:
@@ -328,6 +428,62 @@ async def analyze_rug_pull_risk(coin_id: str, provided_coin_data: Dict[str, Any]
             coin_name=coin_id.replace("-", " ").title(),
             coin_symbol=coin_id.split("-")[0].upper()
         )
-        # Cache the mock result
-        update_cache(coin_id, analysis=mock_result.dict())
-        return mock_result 
\ No newline at end of file
+        # Cache the mock result, unless the failure was transient
+        if not isinstance(e, TRANSIENT_ERRORS):
+            update_cache(coin_id, analysis=mock_result.dict(), source="mock")
+        return mock_result 
+
+def refresh_heuristic_scores(top_n: int) -> int:
+    """
+    Pre-score the top `top_n` coins by market cap from a single markets snapshot.
+    
+    Clear-cut coins get a cached heuristic analysis; ambiguous ones only get their
+    market data cached so a later LLM analysis doesn't need another CoinGecko call.
+    Returns the number of coins scored locally.
+    """
+    response = throttled_request(
+        f"{COINGECKO_MARKETS_URL}?vs_currency=usd&order=market_cap_desc&per_page={top_n}&page=1"
+    )
+    if response.status_code != 200:
+        logging.warning(f"CoinGecko markets API error: {response.status_code}, {response.text}")
+        return 0
+    
+    snapshot = response.json()
+    coin_infos = [extract_coin_info(coin) for coin in snapshot]
+    scored = 0
+    
+    for coin, coin_info, heuristic in zip(snapshot, coin_infos, score_coins(coin_infos)):
+        coin_id = coin.get("id")
+        if not coin_id:
+            continue
+        
+        cache_entry = COIN_CACHE.get(coin_id)
+        if cache_entry and cache_entry.get("analysis") and cache_entry.get("source") == "llm":
+            # Keep LLM analyses until they expire; heuristic and mock results get replaced
+            continue
+        
+        if heuristic:
+            result = RugPullRisk(coin_info=coin_info, **heuristic)
+            update_cache(coin_id, data=coin, analysis=result.dict(), source="heuristic")
+            scored += 1
+        else:
+            # Drop a stale heuristic or mock verdict so the next request asks the LLM
+            if cache_entry:
+                cache_entry.pop("analysis", None)
+            update_cache(coin_id, data=coin)
+    
+    logging.info(f"Pre-scored {scored} of {len(snapshot)} top coins locally")
+    return scored
+
+async def heuristic_refresh_loop():
+    """Background job that keeps heuristic scores for the top coins fresh."""
+    top_n = get_settings().rugpull_precompute_top_n
+    if top_n <= 0:
+        return
+    
+    while True:
+        try:
+            await asyncio.to_thread(refresh_heuristic_scores, top_n)
+        except Exception as e:
+            logging.error(f"Error refreshing heuristic scores: {e}")
+        await asyncio.sleep(HEURISTIC_REFRESH_INTERVAL)
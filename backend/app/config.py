@@ -0,0 +1,62 @@
+import os
+import json
+from functools import lru_cache
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+# Fallback NewsAPI key used when NEWSAPI_KEY is not set
+DEFAULT_NEWSAPI_KEY = "f6ffd53a24f04f11ac0befe694d63471"
+
+
+class Settings(BaseModel):
+    """Application settings, read once from the environment and the .env file"""
+    openai_api_key: Optional[str] = None
+    elevenlabs_api_key: Optional[str] = None
+    newsapi_key: str = DEFAULT_NEWSAPI_KEY
+    xai_api_key: str = ""
+    coingecko_api_key: str = ""
+    coingecko_api_key_2: str = ""
+    # Number of top coins to pre-score locally in the background (0 disables)
+    rugpull_precompute_top_n: int = 100
+    # Per-route-class overrides for admission limits, e.g. {"podcast": {"max_concurrent": 2}}
+    admission_limits: Dict[str, Dict[str, float]] = {}
+    # Cap on expensive operations running at once across all route classes
+    admission_global_max_concurrent: int = 8
+    # API keys issued to clients; a matching X-API-Key identifies the client for quotas
+    api_keys: List[str] = []
+    # Reverse proxies in front of the app that append to X-Forwarded-For (Railway: 1).
+    # Set to 0 when the app is exposed directly, so the header is ignored.
+    trusted_proxy_hops: int = 1
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from the current process environment."""
+        return cls(
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            elevenlabs_api_key=os.getenv("ELEVENLABS_API_KEY"),
+            newsapi_key=os.getenv("NEWSAPI_KEY", DEFAULT_NEWSAPI_KEY),
+            xai_api_key=os.getenv("XAI_API_KEY", ""),
+            coingecko_api_key=os.getenv("COINGECKO_API_KEY", ""),
+            coingecko_api_key_2=os.getenv("COINGECKO_API_KEY_2", ""),
+            rugpull_precompute_top_n=int(os.getenv("RUGPULL_PRECOMPUTE_TOP_N", "100")),
+            admission_limits=json.loads(os.getenv("ADMISSION_LIMITS", "{}")),
+            admission_global_max_concurrent=int(os.getenv("ADMISSION_GLOBAL_MAX_CONCURRENT", "8")),
+            api_keys=[k.strip() for k in os.getenv("API_KEYS", "").split(",") if k.strip()],
+            trusted_proxy_hops=int(os.getenv("TRUSTED_PROXY_HOPS", "1")),
+        )
+
+    @property
+    def coingecko_api_keys(self) -> List[str]:
+        """All configured CoinGecko keys, in rotation order."""
+        return [k for k in [self.coingecko_api_key, self.coingecko_api_key_2] if k]
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    """Load the .env file and return the shared settings instance.
+
+    The first call does the work; every later call returns the cached instance.
+    """
+    load_dotenv()
+    return Settings.from_env()
@@ -1,14 +1,36 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
 import os
 from app.api.router import api_router
+from app.api.rugpull import heuristic_refresh_loop
+from app.config import get_settings
+from app.services.clients import registry
+from app.services.resilience import breaker_states
+from app.services.admission import admission_stats, init_admission
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load settings once at startup; SDK clients are built lazily on first use."""
+    # Force the .env file to be read now rather than by whichever request gets there first
+    get_settings()
+    # Reject invalid ADMISSION_LIMITS here instead of failing requests later
+    init_admission()
+    # Pre-score top coins in the background without delaying readiness
+    heuristic_task = asyncio.create_task(heuristic_refresh_loop())
+    yield
+    heuristic_task.cancel()
+    registry.close()
 
 # Create FastAPI instance
 app = FastAPI(
     title="SimpliFi Crypto Dashboard API",
     description="API for the SimpliFi Crypto Dashboard",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -37,6 +59,16 @@ app.include_router(api_router, prefix="/api")
 async def root():
     return {"message": "Welcome to SimpliFi Crypto Dashboard API"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe. Reports client and circuit state without constructing any clients."""
+    return {
+        "status": "ready",
+        "clients": registry.status(),
+        "circuits": breaker_states(),
+        "admission": admission_stats(),
+    }
+
 # For debugging
 if __name__ == "__main__":
     import uvicorn
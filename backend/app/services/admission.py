@@ -0,0 +1,214 @@
+from typing import Dict, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from fastapi import Depends, HTTPException, Request
+from app.config import get_settings
+
+# Default limits per route class of expensive endpoints:
+# rate / burst: per-client token bucket (requests per second, bucket size)
+# max_concurrent: operations of this class running at once
+# max_queue: requests allowed to wait for a slot before new ones are shed
+# queue_timeout: seconds a request may wait for a slot
+# expected_duration: initial guess of how long one operation takes (seconds), used for Retry-After
+ROUTE_CLASS_LIMITS = {
+    "podcast": {"rate": 2 / 60, "burst": 3, "max_concurrent": 3, "max_queue": 6, "queue_timeout": 30, "expected_duration": 60},
+    "rugpull": {"rate": 0.5, "burst": 10, "max_concurrent": 6, "max_queue": 24, "queue_timeout": 10, "expected_duration": 5},
+}
+
+# Buckets tracked per route class; the least recently seen client is forgotten beyond this
+MAX_TRACKED_CLIENTS = 10000
+
+# Weight of the latest operation in the moving average of operation duration
+DURATION_SMOOTHING = 0.2
+
+
+class TokenBucket:
+    """Token bucket holding up to `burst` tokens, refilled at `rate` tokens per second."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token. Returns 0 on success, otherwise seconds until one is available."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Admission control for one class of expensive routes.
+    
+    Each request must get a token from its client's bucket (429 otherwise), then a
+    slot in both this class's and the global concurrency limit. Requests wait for a
+    slot in a bounded queue; when the queue is full, or the wait times out, the
+    request is shed with 503. Both responses carry a Retry-After estimate.
+    """
+
+    def __init__(self, route_class: str, global_slots: asyncio.Semaphore, rate: float, burst: float,
+                 max_concurrent: int, max_queue: int, queue_timeout: float, expected_duration: float):
+        self.route_class = route_class
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = int(max_concurrent)
+        self.max_queue = int(max_queue)
+        self.queue_timeout = queue_timeout
+        self.avg_duration = expected_duration
+        self.active = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._global_slots = global_slots
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _take_token(self, client_key: str) -> float:
+        bucket = self._buckets.get(client_key)
+        if bucket is None:
+            bucket = self._buckets[client_key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_key)
+        return bucket.take()
+
+    def _retry_after(self) -> int:
+        """Rough time until a slot frees up for a request joining the queue now."""
+        return max(1, math.ceil(self.avg_duration * (self.waiting + 1) / self.max_concurrent))
+
+    def _reject(self, status_code: int, detail: str, retry_after: float):
+        logging.warning(f"Admission ({self.route_class}): {detail}")
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    async def _acquire(self):
+        await self._slots.acquire()
+        try:
+            await self._global_slots.acquire()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    @asynccontextmanager
+    async def admit(self, client_key: str):
+        """Hold a slot for the duration of the block, or raise 429/503."""
+        wait = self._take_token(client_key)
+        if wait:
+            self._reject(429, f"Rate limit exceeded for {self.route_class} requests", wait)
+        
+        if not self._slots.locked() and not self._global_slots.locked():
+            # A slot is free, so this doesn't block
+            await self._acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self._reject(503, f"Too many {self.route_class} requests queued, try again later", self._retry_after())
+            
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject(503, f"Timed out waiting for a {self.route_class} slot, try again later", self._retry_after())
+            finally:
+                self.waiting -= 1
+        
+        self.active += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._global_slots.release()
+            self._slots.release()
+            duration = time.monotonic() - start
+            self.avg_duration += DURATION_SMOOTHING * (duration - self.avg_duration)
+
+
+_controllers: Dict[str, AdmissionController] = {}
+_global_slots: Optional[asyncio.Semaphore] = None
+
+def _validate_overrides(route_class: str, overrides: Dict[str, float]):
+    """Raise ValueError for unknown limit names or out-of-range values in ADMISSION_LIMITS."""
+    unknown = set(overrides) - set(ROUTE_CLASS_LIMITS[route_class])
+    if unknown:
+        raise ValueError(f"ADMISSION_LIMITS: unknown {route_class} limits: {', '.join(sorted(unknown))}")
+    for name, value in overrides.items():
+        # An empty queue just means shedding whenever all slots are busy
+        if value < 0 or (value == 0 and name != "max_queue"):
+            raise ValueError(f"ADMISSION_LIMITS: {route_class}.{name} must be positive, got {value}")
+
+def get_controller(route_class: str) -> AdmissionController:
+    """Get (or create) the admission controller for a route class, applying settings overrides."""
+    global _global_slots
+    if route_class not in _controllers:
+        settings = get_settings()
+        if _global_slots is None:
+            if settings.admission_global_max_concurrent < 1:
+                raise ValueError("ADMISSION_GLOBAL_MAX_CONCURRENT must be at least 1")
+            _global_slots = asyncio.Semaphore(settings.admission_global_max_concurrent)
+        overrides = settings.admission_limits.get(route_class, {})
+        _validate_overrides(route_class, overrides)
+        limits = {**ROUTE_CLASS_LIMITS[route_class], **overrides}
+        _controllers[route_class] = AdmissionController(route_class, _global_slots, **limits)
+    return _controllers[route_class]
+
+def init_admission():
+    """Build every route class's controller now, so bad admission settings fail at startup."""
+    unknown = set(get_settings().admission_limits) - set(ROUTE_CLASS_LIMITS)
+    if unknown:
+        raise ValueError(f"ADMISSION_LIMITS: unknown route classes: {', '.join(sorted(unknown))}")
+    for route_class in ROUTE_CLASS_LIMITS:
+        get_controller(route_class)
+
+def admission_stats() -> Dict[str, Dict[str, int]]:
+    """Active and queued operations per route class."""
+    return {name: {"active": c.active, "waiting": c.waiting} for name, c in _controllers.items()}
+
+def client_key(request: Request) -> str:
+    """
+    Identify the client by a server-issued API key, otherwise by IP address.
+    
+    Unknown API keys are ignored. The IP comes from the X-Forwarded-For entry
+    appended by the outermost trusted proxy (counting `trusted_proxy_hops` from
+    the right); entries further left are client-supplied and can't be trusted.
+    """
+    settings = get_settings()
+    api_key = request.headers.get("x-api-key")
+    if api_key and api_key in settings.api_keys:
+        # Bucket by a digest so the key itself never appears in admission state
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    
+    hops = settings.trusted_proxy_hops
+    forwarded = [host.strip() for host in request.headers.get("x-forwarded-for", "").split(",") if host.strip()]
+    if hops > 0 and len(forwarded) >= hops:
+        return "ip:" + forwarded[-hops]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+def admit(request: Request, route_class: str):
+    """
+    Admission control as an async context manager, for routes that only need to
+    gate part of their work (e.g. skip it for cached results).
+    """
+    return get_controller(route_class).admit(client_key(request))
+
+def admission_control(route_class: str):
+    """
+    Route dependency that applies admission control for `route_class`.
+    
+    Usage: @router.post(..., dependencies=[admission_control("podcast")])
+    """
+    async def dependency(request: Request):
+        async with admit(request, route_class):
+            yield
+    return Depends(dependency)
@@ -0,0 +1,64 @@
+import threading
+import logging
+from typing import Any, Callable, Dict
+from app.config import get_settings
+
+# X.ai exposes an OpenAI-compatible API
+XAI_BASE_URL = "https://api.x.ai/v1"
+
+
+class ClientRegistry:
+    """
+    Lazily constructed, shared SDK clients.
+
+    The `openai` package is only imported when a client is first requested, so
+    requests that never call an LLM (and the server boot itself) don't pay for it.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], Any]) -> Any:
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    logging.info(f"Initializing {name} client")
+                    client = factory()
+                    self._clients[name] = client
+        return client
+
+    def openai(self):
+        """OpenAI client used for script generation."""
+        def factory():
+            from openai import OpenAI
+            # Retries are left to the caller so they can't outlive the request deadline
+            return OpenAI(api_key=get_settings().openai_api_key, max_retries=0)
+        return self._get_or_create("openai", factory)
+
+    def xai(self):
+        """OpenAI-compatible client pointed at X.ai's Grok models."""
+        def factory():
+            from openai import OpenAI
+            return OpenAI(api_key=get_settings().xai_api_key, base_url=XAI_BASE_URL, max_retries=0)
+        return self._get_or_create("xai", factory)
+
+    def status(self) -> Dict[str, bool]:
+        """Which clients have been constructed so far (never constructs any)."""
+        return {name: name in self._clients for name in ("openai", "xai")}
+
+    def close(self):
+        """Close any constructed clients and forget them."""
+        with self._lock:
+            for name, client in self._clients.items():
+                try:
+                    client.close()
+                except Exception as e:
+                    logging.warning(f"Error closing {name} client: {e}")
+            self._clients.clear()
+
+
+# Shared registry, initialized in the FastAPI lifespan
+registry = ClientRegistry()
@@ -1,15 +1,14 @@
 from typing import List, Dict, Any
+import asyncio
 import random
 from datetime import datetime, timedelta
 import requests
-import os
-from dotenv import load_dotenv
+from app.config import get_settings
+from app.services.resilience import resilient_get, CircuitOpenError, DeadlineExceeded
 
-# Load environment variables
-load_dotenv()
-
-# NewsAPI Key
-NEWSAPI_KEY = os.getenv("NEWSAPI_KEY", "f6ffd53a24f04f11ac0befe694d63471")
+# NewsAPI call timeout, and delay before hedging a slow request (seconds)
+NEWSAPI_TIMEOUT = 8
+NEWSAPI_HEDGE_AFTER = 2
 
 # Mock news data
 MOCK_NEWS_SOURCES = ["CoinDesk", "CryptoSlate", "Cointelegraph", "The Block", "Decrypt"]
@@ -46,10 +45,12 @@ async def get_crypto_news(coins=None, limit=5) -> Dict[str, Any]:
     # Construct search query
     query = " OR ".join(coins)
     
-    url = f"https://newsapi.org/v2/everything?q={query}&language=en&sortBy=publishedAt&apiKey={NEWSAPI_KEY}"
+    url = f"https://newsapi.org/v2/everything?q={query}&language=en&sortBy=publishedAt&apiKey={get_settings().newsapi_key}"
     
     try:
-        response = requests.get(url)
+        response = await asyncio.to_thread(
+            resilient_get, "newsapi", url, timeout=NEWSAPI_TIMEOUT, hedge_after=NEWSAPI_HEDGE_AFTER
+        )
         response.raise_for_status()  # Raise an exception for HTTP errors
         
         data = response.json()
@@ -61,8 +62,9 @@ async def get_crypto_news(coins=None, limit=5) -> Dict[str, Any]:
         formatted_articles = []
         
         for article in articles:
-            title = article.get("title", "No Title")
-            description = article.get("description", "No Summary")
+            # NewsAPI returns null for missing fields, so fall back on falsy values too
+            title = article.get("title") or "No Title"
+            description = article.get("description") or "No Summary"
             link = article.get("url", "#")
             source = article.get("source", {}).get("name", "Unknown Source")
             published_at = article.get("publishedAt", datetime.now().isoformat())
@@ -88,5 +90,5 @@ async def get_crypto_news(coins=None, limit=5) -> Dict[str, Any]:
             "timestamp": datetime.now().isoformat()
         }
     
-    except requests.RequestException as e:
+    except (requests.RequestException, CircuitOpenError, DeadlineExceeded) as e:
         return {"articles": [], "error": f"Error fetching news: {e}"}
\ No newline at end of file
@@ -0,0 +1,216 @@
+from typing import List, Dict, Any, Optional, Set, Tuple
+from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import math
+import re
+from app.services.news_aggregator import get_crypto_news
+from app.services.resilience import deadline
+
+# Maximum number of articles pulled from NewsAPI for a single digest
+MAX_DIGEST_ARTICLES = 40
+
+# Approximate token budget for the digest passed to gpt-4o
+DIGEST_TOKEN_BUDGET = 1200
+
+# Word shingle size and minimum Jaccard similarity of two summaries' shingle sets for near-duplicates
+SHINGLE_SIZE = 3
+JACCARD_DUPLICATE_THRESHOLD = 0.6
+
+# Summaries with fewer shingles (e.g. "No Summary") are too short to compare
+MIN_SUMMARY_SHINGLES = 5
+
+# Budget for fetching news while building a digest (seconds)
+DIGEST_FETCH_DEADLINE = 10
+
+# Recency weight halves every this many hours
+RECENCY_HALF_LIFE_HOURS = 12
+
+# Fetched news per coin set: {coins_key: {"fingerprint": str, "timestamp": datetime}}
+NEWS_CACHE = {}
+NEWS_CACHE_MINUTES = 15
+
+# Built digests keyed by content fingerprint, oldest first
+DIGEST_CACHE = {}
+MAX_DIGEST_CACHE_ENTRIES = 128
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (~4 characters per token)."""
+    return math.ceil(len(text) / 4)
+
+def _shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Split text into a set of overlapping word n-grams."""
+    words = re.findall(r"[a-z0-9$%.]+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def jaccard_similarity(a: Set[str], b: Set[str]) -> float:
+    """Share of shingles two sets have in common, from 0 (disjoint) to 1 (identical)."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def remove_near_duplicates(articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drop articles that are near-duplicates of one seen earlier.
+    
+    Two articles are duplicates if their titles match once the publisher suffix is
+    stripped, or if their summaries share most of their word shingles. Titles are left
+    out of the shingle comparison: they are short, so a reworded headline would outweigh
+    an otherwise identical summary.
+    
+    Articles are expected newest first, so the first copy of a syndicated story is kept.
+    """
+    kept = []
+    seen_shingles = []
+    seen_titles = set()
+    
+    for article in articles:
+        # Wire titles often end with " - Publisher"; ignore that when comparing
+        title = re.sub(r"\s+[-|]\s+[^-|]+$", "", article["title"])
+        title_key = " ".join(re.findall(r"[a-z0-9]+", title.lower()))
+        shingles = _shingles(article["summary"])
+        if len(shingles) < MIN_SUMMARY_SHINGLES:
+            shingles = set()
+        
+        # At most MAX_DIGEST_ARTICLES articles, so exact pairwise comparison is cheap
+        if title_key in seen_titles or any(
+            jaccard_similarity(shingles, seen) >= JACCARD_DUPLICATE_THRESHOLD for seen in seen_shingles
+        ):
+            continue
+        
+        seen_titles.add(title_key)
+        if shingles:
+            seen_shingles.append(shingles)
+        kept.append(article)
+    
+    return kept
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def score_article(article: Dict[str, Any], coins: List[str], now: datetime) -> float:
+    """Rank articles by how many requested coins they cover and how recent they are."""
+    title = article["title"].lower()
+    mentioned = article.get("mentioned_coins") or []
+    relevance = len(mentioned) / len(coins) if coins else 0.0
+    # Headlines about a coin are worth more than passing mentions in the summary
+    relevance += 0.5 * sum(1 for coin in coins if coin.lower() in title)
+    
+    published = _parse_timestamp(article.get("timestamp"))
+    age_hours = max((now - published).total_seconds() / 3600, 0) if published else RECENCY_HALF_LIFE_HOURS * 4
+    recency = 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+    
+    return relevance + recency
+
+def _split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+
+def compile_digest(articles: List[Dict[str, Any]], token_budget: int = DIGEST_TOKEN_BUDGET) -> Tuple[str, int]:
+    """
+    Extractively trim ranked articles to fit within the token budget.
+    
+    The first pass takes each article's headline and lead sentence in rank order,
+    the second adds remaining sentences, so breadth wins over depth.
+    Returns the digest text and the number of articles included.
+    """
+    sections = []  # [(header, included sentences, remaining sentences)]
+    used = 0
+    
+    for article in articles:
+        sentences = _split_sentences(article["summary"])
+        header = f"- {article['title']} ({article['source']})"
+        cost = estimate_tokens(header + "\n") + (estimate_tokens("  " + sentences[0]) if sentences else 0)
+        if used + cost > token_budget:
+            continue
+        sections.append((header, sentences[:1], sentences[1:]))
+        used += cost
+    
+    for _, included, remaining in sections:
+        for sentence in remaining:
+            cost = estimate_tokens(" " + sentence)
+            if used + cost > token_budget:
+                break
+            included.append(sentence)
+            used += cost
+    
+    text = "\n".join(
+        header + ("\n  " + " ".join(included) if included else "")
+        for header, included, _ in sections
+    )
+    return text, len(sections)
+
+def fingerprint_articles(articles: List[Dict[str, Any]], coins: List[str], token_budget: int) -> str:
+    """Content fingerprint of the fetched news, used as the digest cache key."""
+    h = hashlib.sha256()
+    h.update(f"{sorted(c.lower() for c in coins)}|{token_budget}".encode())
+    for article in articles:
+        h.update(f"|{article['url']}|{article['title']}|{article['summary']}".encode())
+    return h.hexdigest()
+
+def _cache_digest(fingerprint: str, digest: Dict[str, Any]):
+    DIGEST_CACHE[fingerprint] = digest
+    while len(DIGEST_CACHE) > MAX_DIGEST_CACHE_ENTRIES:
+        DIGEST_CACHE.pop(next(iter(DIGEST_CACHE)))
+
+async def build_news_digest(coins: List[str], token_budget: int = DIGEST_TOKEN_BUDGET) -> Dict[str, Any]:
+    """
+    Build a compact, deduplicated news digest for the given coins.
+    
+    Pulls articles from NewsAPI, removes near-duplicate stories, ranks the rest by
+    recency and coin relevance and trims them to `token_budget`. Digests are cached by
+    a fingerprint of the fetched news, so podcasts for the same coins reuse them.
+    
+    :param coins: Coin names to fetch news for (e.g., ['Bitcoin', 'Ethereum'])
+    :param token_budget: Approximate maximum number of tokens in the digest
+    :return: Dict with the digest text (empty if no news was found) and stats
+    """
+    coins_key = (tuple(sorted(c.lower() for c in coins)), token_budget)
+    
+    # Reuse a recent digest for the same coins without refetching
+    cache_entry = NEWS_CACHE.get(coins_key)
+    if cache_entry and datetime.now() - cache_entry["timestamp"] < timedelta(minutes=NEWS_CACHE_MINUTES):
+        digest = DIGEST_CACHE.get(cache_entry["fingerprint"])
+        if digest:
+            logging.info(f"Using cached news digest for {', '.join(coins)}")
+            return digest
+    
+    with deadline(DIGEST_FETCH_DEADLINE):
+        news_data = await get_crypto_news(coins, limit=MAX_DIGEST_ARTICLES)
+    articles = news_data.get("articles", [])
+    if news_data.get("error"):
+        logging.warning(f"News digest: {news_data['error']}")
+    
+    # If the fetch failed, an expired digest for the same coins beats no news at all
+    if not articles and cache_entry and cache_entry["fingerprint"] in DIGEST_CACHE:
+        logging.info(f"Using stale news digest for {', '.join(coins)}")
+        return DIGEST_CACHE[cache_entry["fingerprint"]]
+    
+    fingerprint = fingerprint_articles(articles, coins, token_budget)
+    digest = DIGEST_CACHE.get(fingerprint)
+    
+    if not digest:
+        unique_articles = remove_near_duplicates(articles)
+        now = datetime.now(timezone.utc)
+        ranked = sorted(unique_articles, key=lambda a: score_article(a, coins, now), reverse=True)
+        text, articles_used = compile_digest(ranked, token_budget)
+        
+        digest = {
+            "text": text,
+            "fingerprint": fingerprint,
+            "articles_fetched": len(articles),
+            "duplicates_removed": len(articles) - len(unique_articles),
+            "articles_used": articles_used,
+            "estimated_tokens": estimate_tokens(text),
+        }
+        _cache_digest(fingerprint, digest)
+    
+    # Don't pin an empty digest when the fetch failed; retry on the next podcast
+    if articles:
+        NEWS_CACHE[coins_key] = {"fingerprint": fingerprint, "timestamp": datetime.now()}
+    return digest
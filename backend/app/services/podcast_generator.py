@@ -1,18 +1,15 @@
-from typing import List, Dict, Any
-import time
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import asyncio
 import os
 import uuid
 from datetime import datetime
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import requests
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Get API keys from environment variables
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+from app.config import get_settings
+from app.services.clients import registry
+from app.services.news_digest import build_news_digest
+from app.services.resilience import circuit, check_deadline, request_timeout
 
 # Conversation generator prompt
 CONVERSATION_GENERATOR_PROMPT = """
@@ -36,89 +33,161 @@ And so on, alternating between speakers.
 </FORMAT>
 """
 
-def generate_conversation(news_article: str) -> str:
-    """Generate a conversation between two people discussing the news using OpenAI's official client"""
-    # Initialize the OpenAI client
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    
-    # Define system and user messages
-    messages = [
+# Voice IDs for different speakers
+VOICE_IDS = {
+    "Jamie": "XjLkpWUlnhS8i7gGz3lZ",  # First voice ID
+    "Rachel": "21m00Tcm4TlvDq8ikWAM"   # Second voice ID (Rachel)
+}
+
+# Maximum number of ElevenLabs requests in flight at once while streaming
+TTS_MAX_CONCURRENCY = 2
+
+# Upstream call timeouts (seconds); each is further capped by the request deadline
+SCRIPT_TIMEOUT = 60  # Time to first token, or between streamed chunks
+TTS_TIMEOUT = 30
+
+def build_conversation_messages(news_article: str) -> List[Dict[str, str]]:
+    """Build the chat messages used to generate the conversation"""
+    return [
         {"role": "system", "content": CONVERSATION_GENERATOR_PROMPT},
         {"role": "user", "content": f"Generate a conversation based on the following news article:{news_article}"}
     ]
+
+def stream_conversation(news_article: str) -> Iterator[str]:
+    """Generate the conversation with streaming enabled, yielding each line as soon as it is complete"""
+    client = registry.openai()
+    timeout = request_timeout(SCRIPT_TIMEOUT)
     
-    # Make the API call
-    completion = client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages,
-        temperature=0.7,
-    )
+    with circuit("openai"):
+        stream = client.chat.completions.create(
+            model="gpt-4o",
+            messages=build_conversation_messages(news_article),
+            temperature=0.7,
+            stream=True,
+            timeout=timeout,
+        )
+        
+        buffer = ""
+        try:
+            for chunk in stream:
+                # The timeout only bounds each read, so enforce the overall deadline here
+                check_deadline()
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                
+                buffer += delta
+                while "\n" in buffer:
+                    line, buffer = buffer.split("\n", 1)
+                    yield line
+        finally:
+            # Stop the completion (and its billing) if the caller gives up early
+            stream.close()
     
-    # Extract and return the conversation
-    return completion.choices[0].message.content
+    # Flush the final line if the model didn't end with a newline
+    if buffer:
+        yield buffer
 
-def convert_to_speech(conversation: str) -> bytes:
-    """Convert the conversation to speech using ElevenLabs"""
-    # Parse the conversation to separate speakers
-    lines = conversation.strip().split("\n")
-    dialogues = []
-    
-    for line in lines:
-        if line.startswith("Jamie:"):
-            speaker = "Jamie"
-            text = line[7:].strip()
-            dialogues.append({"speaker": speaker, "text": text})
-        elif line.startswith("Rachel:"):
-            speaker = "Rachel"
-            text = line[8:].strip()
-            dialogues.append({"speaker": speaker, "text": text})
-    
+def parse_dialogue_line(line: str) -> Optional[Dict[str, str]]:
+    """Parse a `Jamie: ...` / `Rachel: ...` line, returning None for anything else"""
+    line = line.strip()
+    for speaker in VOICE_IDS:
+        prefix = f"{speaker}:"
+        if line.startswith(prefix):
+            text = line[len(prefix):].strip()
+            return {"speaker": speaker, "text": text} if text else None
+    return None
+
+def synthesize_dialogue(dialogue: Dict[str, str]) -> bytes:
+    """Convert a single line of dialogue to speech using ElevenLabs"""
     # Configure the ElevenLabs API
     headers = {
-        "xi-api-key": ELEVENLABS_API_KEY,
+        "xi-api-key": get_settings().elevenlabs_api_key,
         "Content-Type": "application/json"
     }
     
-    # Voice IDs for different speakers
-    voice_ids = {
-        "Jamie": "XjLkpWUlnhS8i7gGz3lZ",  # First voice ID
-        "Rachel": "21m00Tcm4TlvDq8ikWAM"   # Second voice ID (Rachel)
+    # Make the API call to ElevenLabs
+    payload = {
+        "text": dialogue["text"],
+        "model_id": "eleven_monolingual_v1",
+        "voice_settings": {
+            "stability": 0.5,
+            "similarity_boost": 0.5
+        }
     }
     
-    # Concatenate all audio files
-    audio_segments = []
-    
-    for dialogue in dialogues:
-        speaker = dialogue["speaker"]
-        text = dialogue["text"]
-        
-        # Get the voice ID
-        voice_id = voice_ids.get(speaker)
+    url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_IDS[dialogue['speaker']]}"
+    timeout = request_timeout(TTS_TIMEOUT)
+    with circuit("elevenlabs"):
+        response = requests.post(url, headers=headers, json=payload, timeout=timeout)
         
-        # Add a small pause between speakers
-        if len(audio_segments) > 0:
-            time.sleep(0.5)  # Small delay between API calls
-        
-        # Make the API call to ElevenLabs
-        payload = {
-            "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.5
-            }
-        }
-        
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-        response = requests.post(url, headers=headers, json=payload)
-        
-        if response.status_code == 200:
-            audio_segments.append(response.content)
-        else:
+        # Only server errors and rate limiting say ElevenLabs is unhealthy
+        if response.status_code >= 500 or response.status_code == 429:
             raise Exception(f"ElevenLabs API Error: {response.status_code}, {response.text}")
     
-    # Return the combined audio
-    return b''.join(audio_segments)
+    # Other errors (bad key, quota, invalid text) are ours and shouldn't open the circuit
+    if response.status_code != 200:
+        raise Exception(f"ElevenLabs API Error: {response.status_code}, {response.text}")
+    
+    return response.content
+
+def generate_conversation_audio(news_article: str) -> Tuple[str, bytes]:
+    """
+    Generate the conversation and its audio as a pipeline.
+    
+    The completion is streamed and every finished line is dispatched to ElevenLabs
+    while gpt-4o is still writing the rest, so the total time approaches
+    max(script time, synthesis time) rather than their sum.
+    
+    Returns the full conversation text and the combined audio.
+    """
+    lines = []
+    futures = []
+    script = stream_conversation(news_article)
+    
+    with ThreadPoolExecutor(max_workers=TTS_MAX_CONCURRENCY) as executor:
+        try:
+            for line in script:
+                # Fail as soon as any line's synthesis has failed, not after the whole script
+                for future in futures:
+                    if future.done() and future.exception():
+                        raise future.exception()
+                
+                lines.append(line)
+                dialogue = parse_dialogue_line(line)
+                if dialogue:
+                    # Run in a copy of the current context so the request deadline applies
+                    context = contextvars.copy_context()
+                    futures.append(executor.submit(context.run, synthesize_dialogue, dialogue))
+            
+            # Segments are collected in submission order, so the audio follows the script
+            audio_segments = [future.result() for future in futures]
+        except Exception:
+            # Don't keep paying for the completion or speech once the pipeline has failed
+            script.close()
+            for future in futures:
+                future.cancel()
+            raise
+    
+    return "\n".join(lines), b''.join(audio_segments)
+
+def get_fallback_news_article(coins_covered: List[str]) -> str:
+    """Hardcoded demo article, used when no live news could be fetched"""
+    return f"""
+    {', '.join(coins_covered)} Price Update and Market Analysis
+    
+    Bitcoin has surged above $60,000 for the first time in two weeks, as market sentiment improves following positive regulatory developments. The largest cryptocurrency by market capitalization is up 5.3% in the past 24 hours, currently trading at $61,250.
+    
+    Ethereum has also seen significant gains, rising 4.2% to reach $3,850. This comes after a successful network upgrade that reduced gas fees by approximately 30%.
+    
+    Meanwhile, Solana continues its impressive run, up 8.7% to $220, fueled by growing adoption in the NFT marketplace and several new DeFi projects launching on its blockchain.
+    
+    The recent market uptrend coincides with statements from the SEC chairperson suggesting a more collaborative approach to cryptocurrency regulation. Additionally, a Fortune 500 company announced yesterday that it has added Bitcoin to its treasury reserves, purchasing approximately $400 million worth of the digital asset.
+    
+    Market analysts point to improving institutional adoption and technological advancements as key drivers for the current bull run, though some caution that volatility may increase in the coming weeks as derivative contracts expire.
+    """
 
 async def generate_podcast(
     coin_ids: List[str], 
@@ -130,9 +199,9 @@ async def generate_podcast(
     Generate a podcast about the specified cryptocurrencies
     
     This implementation:
-    1. Generates a news article about the specified cryptocurrencies
-    2. Creates a conversation between two hosts
-    3. Converts the conversation to speech using ElevenLabs
+    1. Builds a token-bounded news digest about the specified cryptocurrencies
+    2. Streams a conversation between two hosts
+    3. Converts each line to speech using ElevenLabs as soon as it is written
     4. Stores the audio file and returns metadata
     """
     # Unique identifier for this podcast
@@ -157,24 +226,16 @@ async def generate_podcast(
     # Get the actual names or use IDs if not found
     coins_covered = [coin_names.get(coin_id.lower(), coin_id) for coin_id in coin_ids]
     
-    # For the demo, we'll use a hardcoded news article
-    # In a real implementation, you would generate this dynamically based on the coins
-    news_article = f"""
-    {', '.join(coins_covered)} Price Update and Market Analysis
-    
-    Bitcoin has surged above $60,000 for the first time in two weeks, as market sentiment improves following positive regulatory developments. The largest cryptocurrency by market capitalization is up 5.3% in the past 24 hours, currently trading at $61,250.
-    
-    Ethereum has also seen significant gains, rising 4.2% to reach $3,850. This comes after a successful network upgrade that reduced gas fees by approximately 30%.
-    
-    Meanwhile, Solana continues its impressive run, up 8.7% to $220, fueled by growing adoption in the NFT marketplace and several new DeFi projects launching on its blockchain.
-    
-    The recent market uptrend coincides with statements from the SEC chairperson suggesting a more collaborative approach to cryptocurrency regulation. Additionally, a Fortune 500 company announced yesterday that it has added Bitcoin to its treasury reserves, purchasing approximately $400 million worth of the digital asset.
-    
-    Market analysts point to improving institutional adoption and technological advancements as key drivers for the current bull run, though some caution that volatility may increase in the coming weeks as derivative contracts expire.
-    """
+    # Build a compact, deduplicated digest of the latest news for these coins
+    digest = await build_news_digest(coins_covered)
+    if digest["text"]:
+        news_article = f"{', '.join(coins_covered)} News Digest\n\n{digest['text']}"
+    else:
+        news_article = get_fallback_news_article(coins_covered)
     
-    # Generate a conversation between two hosts
-    conversation = generate_conversation(news_article)
+    # Generate a conversation between two hosts, converting it to speech as it streams in
+    # Run the blocking pipeline in a worker thread so other requests keep being served
+    conversation, audio_data = await asyncio.to_thread(generate_conversation_audio, news_article)
     
     # Save the conversation to a file in the static directory
     static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "podcasts")
@@ -183,9 +244,6 @@ async def generate_podcast(
     with open(conversation_path, "w") as f:
         f.write(conversation)
     
-    # Convert the conversation to speech
-    audio_data = convert_to_speech(conversation)
-    
     # Save the audio to a file
     audio_filename = f"{podcast_id}.mp3"
     audio_path = os.path.join(static_dir, audio_filename)
@@ -0,0 +1,255 @@
+from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FutureTimeoutError, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import threading
+import time
+import requests
+
+# Per-call timeout used when no tighter deadline applies (seconds)
+DEFAULT_TIMEOUT = 10
+
+# Breaker settings per upstream:
+# failure_threshold: consecutive failures (errors or slow calls) before the circuit opens
+# slow_call_seconds: calls slower than this count as failures (None disables)
+# reset_timeout: seconds the circuit stays open before a trial call is allowed
+BREAKER_SETTINGS = {
+    "coingecko": {"failure_threshold": 5, "slow_call_seconds": 5, "reset_timeout": 30},
+    "newsapi": {"failure_threshold": 5, "slow_call_seconds": 5, "reset_timeout": 30},
+    "xai": {"failure_threshold": 3, "slow_call_seconds": 8, "reset_timeout": 60},  # Below rugpull's XAI_TIMEOUT
+    "openai": {"failure_threshold": 3, "slow_call_seconds": None, "reset_timeout": 60},
+    "elevenlabs": {"failure_threshold": 3, "slow_call_seconds": 20, "reset_timeout": 60},
+}
+DEFAULT_BREAKER_SETTINGS = {"failure_threshold": 5, "slow_call_seconds": None, "reset_timeout": 30}
+
+# Absolute monotonic time by which the current request must finish, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+# Threads used to race hedged GET requests
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedged-get")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request's deadline budget has been used up."""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        # Seconds until the breaker lets a trial call through
+        self.retry_after = retry_after
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Give the enclosed work a deadline budget of `seconds`.
+    
+    Deadlines nest: an inner budget can only tighten the outer one. The deadline is
+    carried in a context variable, so it follows the request through nested calls,
+    `asyncio.to_thread` and executors that run work in a copied context.
+    """
+    expires_at = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        expires_at = min(expires_at, outer)
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_time() -> Optional[float]:
+    """Seconds left in the current deadline, or None if there is no deadline."""
+    expires_at = _deadline.get()
+    return None if expires_at is None else expires_at - time.monotonic()
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+def request_timeout(cap: float = DEFAULT_TIMEOUT) -> float:
+    """Timeout for the next upstream call: `cap`, trimmed to the remaining deadline."""
+    remaining = remaining_time()
+    if remaining is None:
+        return cap
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(cap, remaining)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream.
+    
+    Closed: calls pass through. After `failure_threshold` consecutive failures the
+    circuit opens and calls fail fast with CircuitOpenError. Once `reset_timeout`
+    has passed, a single trial call is let through (half-open); its outcome closes
+    or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, slow_call_seconds: Optional[float], reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through right now."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            retry_after = max(self._opened_at + self.reset_timeout - time.monotonic(), 1)
+        raise CircuitOpenError(f"{self.name} circuit is open", retry_after)
+
+    def record_success(self, latency: float):
+        """Record a completed call; slow calls count against the upstream."""
+        if self.slow_call_seconds is not None and latency > self.slow_call_seconds:
+            logging.warning(f"{self.name} call took {latency:.1f}s")
+            self.record_failure()
+            return
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Give up a half-open trial without a verdict (e.g. the call was cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit once the threshold is reached."""
+        with self._lock:
+            self._failures += 1
+            reopen = self._trial_in_flight
+            self._trial_in_flight = False
+            if reopen or self._failures >= self.failure_threshold:
+                if self._opened_at is None or reopen:
+                    logging.warning(f"Opening {self.name} circuit after {self._failures} failures")
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """Get (or create) the shared circuit breaker for an upstream."""
+    with _breakers_lock:
+        if upstream not in _breakers:
+            settings = BREAKER_SETTINGS.get(upstream, DEFAULT_BREAKER_SETTINGS)
+            _breakers[upstream] = CircuitBreaker(upstream, **settings)
+        return _breakers[upstream]
+
+def breaker_states() -> Dict[str, str]:
+    """Current state of every breaker that has been used."""
+    return {name: breaker.state for name, breaker in _breakers.items()}
+
+@contextmanager
+def circuit(upstream: str):
+    """
+    Guard a block that calls `upstream`.
+    
+    Fails fast with CircuitOpenError while the circuit is open, and records the
+    block's outcome (exception or latency) otherwise.
+    """
+    breaker = get_breaker(upstream)
+    breaker.before_call()
+    start = time.monotonic()
+    try:
+        yield
+    except Exception:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled or abandoned (CancelledError, GeneratorExit): say nothing about
+        # the upstream, but don't leave a half-open trial stuck in flight
+        breaker.release_trial()
+        raise
+    breaker.record_success(time.monotonic() - start)
+
+def hedged_get(url: str, headers: Optional[Dict[str, str]], timeout: float, hedge_after: float) -> requests.Response:
+    """
+    GET `url`, sending a second identical request if the first hasn't answered
+    within `hedge_after` seconds. Returns whichever succeeds first.
+    
+    Only use for idempotent requests.
+    """
+    expires_at = time.monotonic() + timeout
+    first = _hedge_executor.submit(requests.get, url, headers=headers, timeout=timeout)
+    try:
+        return first.result(timeout=hedge_after)
+    except FutureTimeoutError:
+        pass
+    
+    logging.info(f"Hedging slow GET to {url.split('?')[0]}")
+    second = _hedge_executor.submit(requests.get, url, headers=headers, timeout=max(expires_at - time.monotonic(), 0.1))
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    
+    while pending:
+        done, pending = wait(pending, timeout=max(expires_at - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    
+    raise error or requests.Timeout(f"GET {url.split('?')[0]} timed out after {timeout}s")
+
+def resilient_get(
+    upstream: str,
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    hedge_after: Optional[float] = None,
+) -> requests.Response:
+    """
+    GET through the upstream's circuit breaker with a deadline-aware timeout.
+    
+    5xx and 429 responses count as failures but are still returned to the caller.
+    Set `hedge_after` to race a second request when the first is slow.
+    """
+    call_timeout = request_timeout(timeout)
+    breaker = get_breaker(upstream)
+    breaker.before_call()
+    start = time.monotonic()
+    try:
+        if hedge_after is not None and hedge_after < call_timeout:
+            response = hedged_get(url, headers, call_timeout, hedge_after)
+        else:
+            response = requests.get(url, headers=headers, timeout=call_timeout)
+    except Exception:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.release_trial()
+        raise
+    
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+    else:
+        breaker.record_success(time.monotonic() - start)
+    return response
@@ -0,0 +1,129 @@
+from typing import List, Dict, Any, Optional
+import math
+
+# Market cap (log10 USD) at or above which cap risk is zero, and at or below which it is maximal
+SAFE_MARKET_CAP_LOG10 = 10.0   # $10B
+RISKY_MARKET_CAP_LOG10 = 6.0   # $1M
+
+# 24h volume / market cap considered healthy; risk grows with each order of magnitude away from it
+HEALTHY_VOLUME_RATIO = 0.05
+VOLUME_RATIO_DECADES = 2.0
+
+# 24h high/low range (as a fraction of the low) treated as maximally volatile
+MAX_DAILY_RANGE = 0.5
+
+# Weights for cap, liquidity, supply concentration and volatility risk (sum to 1)
+FEATURE_WEIGHTS = (0.45, 0.2, 0.2, 0.15)
+
+# Risk assumed for a feature whose inputs are missing
+MISSING_FEATURE_RISK = 0.5
+
+# Scores outside this open interval are clear-cut and don't need the LLM
+LOW_RISK_MAX_SCORE = 20
+HIGH_RISK_MIN_SCORE = 75
+
+def _to_float(value: Any) -> float:
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return result if result > 0 else math.nan
+
+def compute_risk_features(coin_infos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compute per-coin risk features for a whole market snapshot at once.
+    
+    Takes a list of `extract_coin_info` dicts and returns NumPy arrays of risk
+    components in [0, 1] (1 = risky), the weighted 0-100 score and raw ratios.
+    """
+    # numpy is only needed for scoring, so keep it off the import path at boot
+    import numpy as np
+    
+    def column(field: str):
+        return np.array([_to_float(info.get(field)) for info in coin_infos], dtype=float)
+    
+    market_cap = column("Market Cap")
+    volume = column("24h Trading Volume")
+    circulating = column("Circulating Supply")
+    total_supply = column("Total Supply")
+    max_supply = column("Max Supply")
+    low = column("24h Low")
+    high = column("24h High")
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cap_risk = np.clip(
+            (SAFE_MARKET_CAP_LOG10 - np.log10(market_cap)) / (SAFE_MARKET_CAP_LOG10 - RISKY_MARKET_CAP_LOG10), 0, 1
+        )
+        
+        # Both illiquid coins and coins trading many times their market cap are suspicious
+        volume_ratio = volume / market_cap
+        liquidity_risk = np.clip(np.abs(np.log10(volume_ratio / HEALTHY_VOLUME_RATIO)) / VOLUME_RATIO_DECADES, 0, 1)
+        
+        # A small circulating share means most supply sits with insiders or is yet to unlock
+        supply_cap = np.where(np.isnan(total_supply), max_supply, total_supply)
+        circulating_ratio = np.clip(circulating / supply_cap, 0, 1)
+        supply_risk = 1 - circulating_ratio
+        
+        daily_range = (high - low) / low
+        volatility_risk = np.clip(daily_range / MAX_DAILY_RANGE, 0, 1)
+    
+    components = np.nan_to_num(
+        np.vstack([cap_risk, liquidity_risk, supply_risk, volatility_risk]), nan=MISSING_FEATURE_RISK
+    )
+    scores = np.rint(100 * (np.asarray(FEATURE_WEIGHTS) @ components)).astype(int)
+    
+    return {
+        "score": scores,
+        "has_market_data": ~np.isnan(market_cap) & ~np.isnan(volume),
+        "market_cap": market_cap,
+        "volume_ratio": volume_ratio,
+        "circulating_ratio": circulating_ratio,
+        "daily_range": daily_range,
+    }
+
+def _describe(market_cap: float, volume_ratio: float, circulating_ratio: float, daily_range: float) -> str:
+    parts = [f"market cap ${market_cap:,.0f}"]
+    if not math.isnan(volume_ratio):
+        parts.append(f"24h volume at {volume_ratio:.1%} of market cap")
+    if not math.isnan(circulating_ratio):
+        parts.append(f"{circulating_ratio:.1%} of supply circulating")
+    if not math.isnan(daily_range):
+        parts.append(f"24h price range of {daily_range:.1%}")
+    return ", ".join(parts)
+
+def score_coins(coin_infos: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Score a batch of coins locally.
+    
+    Returns one entry per coin: `{"score", "justification"}` for clear-cut coins,
+    or None when the coin is ambiguous (or lacks market data) and should go to the LLM.
+    """
+    if not coin_infos:
+        return []
+    
+    features = compute_risk_features(coin_infos)
+    results = []
+    
+    for i in range(len(coin_infos)):
+        score = int(features["score"][i])
+        if not features["has_market_data"][i] or LOW_RISK_MAX_SCORE < score < HIGH_RISK_MIN_SCORE:
+            results.append(None)
+            continue
+        
+        summary = _describe(
+            float(features["market_cap"][i]),
+            float(features["volume_ratio"][i]),
+            float(features["circulating_ratio"][i]),
+            float(features["daily_range"][i]),
+        )
+        if score <= LOW_RISK_MAX_SCORE:
+            verdict = "Low rug pull risk based on market fundamentals"
+        else:
+            verdict = "High rug pull risk based on market fundamentals"
+        results.append({"score": score, "justification": f"{verdict}: {summary}."})
+    
+    return results
+
+def score_coin(coin_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Score a single coin locally; None means the result is ambiguous."""
+    return score_coins([coin_info])[0]
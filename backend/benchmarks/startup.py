@@ -0,0 +1,87 @@
+"""
+Startup-time benchmark for the backend.
+
+Measures, over several runs:
+1. How long `import app.main` takes in a fresh interpreter (and that no SDK is imported)
+2. How long it takes from launching uvicorn to the first successful response from /ready
+
+Run from the backend directory:
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported in a clean interpreter; prints import time and whether openai got pulled in
+IMPORT_SNIPPET = (
+    "import sys, time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t, 'openai' in sys.modules)"
+)
+
+
+def free_port() -> int:
+    """Ask the OS for an unused TCP port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import() -> Tuple[float, bool]:
+    """Time a cold `import app.main` in a subprocess."""
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, text=True)
+    seconds, openai_loaded = output.split()
+    return float(seconds), openai_loaded == "True"
+
+
+def measure_first_request(timeout: float = 30.0) -> float:
+    """Time from spawning uvicorn to the first 200 response from /ready."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/ready"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"Server did not become ready within {timeout} seconds")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend cold start")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per measurement (default: 5)")
+    args = parser.parse_args()
+
+    import_times = []
+    openai_loaded = False
+    for _ in range(args.runs):
+        seconds, loaded = measure_import()
+        import_times.append(seconds)
+        openai_loaded = openai_loaded or loaded
+
+    ready_times = [measure_first_request() for _ in range(args.runs)]
+
+    print(f"import app.main:      median {statistics.median(import_times) * 1000:.0f} ms, max {max(import_times) * 1000:.0f} ms")
+    print(f"openai imported at boot: {'yes' if openai_loaded else 'no'}")
+    print(f"start -> first /ready: median {statistics.median(ready_times) * 1000:.0f} ms, max {max(ready_times) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()